@@ -5,8 +5,9 @@ import numpy as np
 import pandas as pd
 import h5py
 from tqdm import tqdm
-from typing import Dict
+from typing import Dict, Optional
 import time
+from contextlib import nullcontext
 from torch.amp import autocast              # for mixed precision
 import warnings
 warnings.filterwarnings(
@@ -18,12 +19,40 @@ warnings.filterwarnings(
 class AIMNET2_Inference:
     BATCH_SIZE = 1000                       # adjust this for optimal GPU usage
 
-    def __init__(self, model_path: str, h5_path: str, ds_name: str):
-        self.model = torch.jit.load(model_path).cuda()  
+    def __init__(self, model_path: str, h5_path: Optional[str] = None, ds_name: Optional[str] = None, device: str = 'cuda'):
+        self.model_path = model_path
         self.model_name = os.path.splitext(os.path.basename(model_path))[0]
+        self.device = torch.device(device)
+        if self.device.type == 'cpu':
+            self.model = self.load_frozen_cpu_model(model_path)
+            self.coord_dtype = torch.float32        # no fp16 autocast on CPU
+        else:
+            self.model = torch.jit.load(model_path).cuda()
+            self.coord_dtype = torch.float16
         self.h5_path = h5_path
         self.ds_name = ds_name
-        self.data_dict = self.extract_input_from_h5()
+        self.data_dict = self.extract_input_from_h5() if h5_path is not None else {}
+
+    def load_frozen_cpu_model(self, model_path: str) -> torch.jit.ScriptModule:
+        # freezing is slow, so the frozen module is cached next to the model (one file per torch version).
+        # optimize_for_inference may insert MKLDNN prepacked ops that do not serialize, so it always runs after loading.
+        cache_path = os.path.join(os.path.dirname(model_path), f"{self.model_name}.cpu_frozen.torch{torch.__version__}.jpt")
+        frozen = None
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+            try:
+                frozen = torch.jit.load(cache_path, map_location='cpu')
+                print(f"Loaded cached frozen CPU model: {cache_path}")
+            except Exception as e:                  # caching is only an optimization, refreeze on any failure
+                print(f"Could not load cached frozen CPU model {cache_path}, refreezing: {e}")
+
+        if frozen is None:
+            frozen = torch.jit.freeze(torch.jit.load(model_path, map_location='cpu').eval())
+            try:
+                torch.jit.save(frozen, cache_path)
+                print(f"Saved frozen CPU model to: {cache_path}")
+            except Exception as e:
+                print(f"Could not cache frozen CPU model at {cache_path}: {e}")
+        return torch.jit.optimize_for_inference(frozen)
 
     def extract_input_from_h5(self, chunk_size: int = 1000) -> Dict[str, Dict[str, Dict[str, torch.Tensor]]]:
         data_dict = {}
@@ -34,15 +63,15 @@ class AIMNET2_Inference:
             for start in tqdm(range(0, num_keys, chunk_size), desc="Extracting HDF5 data in chunks"):
                 end = min(start + chunk_size, num_keys)
                 for key in keys[start:end]:
-                    coord = torch.tensor(h5_file[key]['coord'][:], dtype=torch.float16, requires_grad=False).cuda(non_blocking=True)
-                    numbers = torch.tensor(h5_file[key]['numbers'][:], requires_grad=False).cuda(non_blocking=True)
-                    charge = torch.tensor(h5_file[key]['charge'][:], requires_grad=False).cuda(non_blocking=True)
-                    charge0 = torch.tensor(h5_file[key]['charge0'][:], requires_grad=False).cuda(non_blocking=True)
-                    charge1 = torch.tensor(h5_file[key]['charge1'][:], requires_grad=False).cuda(non_blocking=True)
-                    geom_id = torch.tensor(h5_file[key]['geom_id'][:], requires_grad=False).cuda(non_blocking=True)
-                    natoms0 = torch.tensor(h5_file[key]['natoms0'][:], requires_grad=False).cuda(non_blocking=True)
-                    natoms1 = torch.tensor(h5_file[key]['natoms1'][:], requires_grad=False).cuda(non_blocking=True)
-                    energy_int = torch.tensor(h5_file[key]['energy_int'][:], requires_grad=False).cuda(non_blocking=True)
+                    coord = torch.tensor(h5_file[key]['coord'][:], dtype=self.coord_dtype, requires_grad=False).to(self.device, non_blocking=True)
+                    numbers = torch.tensor(h5_file[key]['numbers'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    charge = torch.tensor(h5_file[key]['charge'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    charge0 = torch.tensor(h5_file[key]['charge0'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    charge1 = torch.tensor(h5_file[key]['charge1'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    geom_id = torch.tensor(h5_file[key]['geom_id'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    natoms0 = torch.tensor(h5_file[key]['natoms0'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    natoms1 = torch.tensor(h5_file[key]['natoms1'][:], requires_grad=False).to(self.device, non_blocking=True)
+                    energy_int = torch.tensor(h5_file[key]['energy_int'][:], requires_grad=False).to(self.device, non_blocking=True)
 
                     data_dict[key] = {}
 
@@ -82,29 +111,96 @@ class AIMNET2_Inference:
                         }
         return data_dict
 
-    def model_inference(self, data: Dict[str, torch.Tensor]) -> np.ndarray:
-        
-        with torch.no_grad(), autocast(device_type='cuda'):                     
-            output = self.model(data)       
+    def model_inference(self, data: Dict[str, torch.Tensor], model=None) -> np.ndarray:
+        model = self.model if model is None else model
+        amp = autocast(device_type='cuda') if self.device.type == 'cuda' else nullcontext()
+        with torch.no_grad(), amp:
+            output = model(data)
         energy = output['energy'].detach().cpu().numpy().flatten() * 23.0609    
         return energy
 
-    def batch_model_inference(self, data_list: Dict[str, torch.Tensor]) -> np.ndarray:
+    def batch_model_inference(self, data_list: Dict[str, torch.Tensor], model=None) -> np.ndarray:
         
         # perform batched inference for faster performance, ensuring async data transfers and mixed precision
         energies = []
         for i in range(0, len(data_list['coord']), self.BATCH_SIZE):
             batch_data = {
-                'coord': data_list['coord'][i:i+self.BATCH_SIZE].cuda(non_blocking=True),  
-                'numbers': data_list['numbers'][i:i+self.BATCH_SIZE].cuda(non_blocking=True),
-                'charge': data_list['charge'][i:i+self.BATCH_SIZE].cuda(non_blocking=True)
+                'coord': data_list['coord'][i:i+self.BATCH_SIZE].to(self.device, non_blocking=True),
+                'numbers': data_list['numbers'][i:i+self.BATCH_SIZE].to(self.device, non_blocking=True),
+                'charge': data_list['charge'][i:i+self.BATCH_SIZE].to(self.device, non_blocking=True)
             }
-            batch_energy = self.model_inference(batch_data)
+            batch_energy = self.model_inference(batch_data, model)
             energies.append(batch_energy)
         return np.concatenate(energies)
 
+    def predict_energies(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        # in-memory entry point used by inference_api, energies in kcal/mol
+        data_list = {
+            'coord': torch.as_tensor(data['coord'], dtype=self.coord_dtype, device=self.device),
+            'numbers': torch.as_tensor(data['numbers'], dtype=torch.long, device=self.device),
+            'charge': torch.as_tensor(data['charge'], dtype=torch.float32, device=self.device)
+        }
+        return self.batch_model_inference(data_list)
+
+    def synchronize(self):
+        if self.device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    def benchmark_frozen_model(self, max_dimers: int = 1000, tolerance: float = 1e-3, strict: bool = False) -> Dict[str, float]:
+        # compare the frozen CPU model against the original TorchScript model on (up to) max_dimers dimers and their
+        # monomers. Agreement is checked on interaction energies, where round-off of the large total energies cancels;
+        # a deviation above tolerance (kcal/mol) is reported, and only raised with strict=True
+        if not self.data_dict:
+            raise ValueError("No input data to benchmark, an h5_path with at least one dimer is required")
+        reference = torch.jit.load(self.model_path, map_location=self.device).eval()
+        samples = []
+        n_dimers = 0
+        for group_data in self.data_dict.values():
+            for data in group_data.values():
+                if n_dimers >= max_dimers:
+                    break
+                n = min(len(data['dimer']['coord']), max_dimers - n_dimers)
+                samples.append({part: {k: data[part][k][:n] for k in ('coord', 'numbers', 'charge')}
+                                for part in ('dimer', 'mol0', 'mol1')})
+                n_dimers += n
+
+        def full_pass(model):
+            e_int, e_total = [], []
+            for sample in samples:
+                e_dim, e_mol0, e_mol1 = (self.batch_model_inference(sample[part], model) for part in ('dimer', 'mol0', 'mol1'))
+                e_int.append(e_dim - e_mol0 - e_mol1)
+                e_total.append(e_dim)
+            return np.concatenate(e_int), np.concatenate(e_total)
+
+        timings, energies = {}, {}
+        for label, model in (('unfrozen', reference), ('frozen', self.model)):
+            full_pass(model)            # untimed warm-up: TorchScript profiles and specializes once per input shape
+            start_time = time.time()
+            energies[label] = full_pass(model)
+            timings[label] = 3 * n_dimers / (time.time() - start_time)
+
+        max_int_diff = float(np.max(np.abs(energies['frozen'][0] - energies['unfrozen'][0])))
+        max_rel_diff = float(np.max(np.abs(energies['frozen'][1] - energies['unfrozen'][1]) /
+                                    np.maximum(np.abs(energies['unfrozen'][1]), 1e-12)))
+        print(f"AIMNet2 unfrozen model: {timings['unfrozen']:.2f} molecules/s")
+        print(f"AIMNet2 frozen model  : {timings['frozen']:.2f} molecules/s ({timings['frozen'] / timings['unfrozen']:.2f}x)")
+        print(f"Max abs interaction energy difference over {n_dimers} dimers: {max_int_diff:.2e} kcal/mol")
+        print(f"Max rel dimer energy difference: {max_rel_diff:.2e}")
+        if not max_int_diff <= tolerance:
+            message = (f"Frozen model interaction energies deviate from the unfrozen model by {max_int_diff:.2e} kcal/mol "
+                       f"(tolerance {tolerance:.0e} kcal/mol)")
+            if strict:
+                raise ValueError(message)
+            print(f"Warning: {message}")
+        return {
+            'unfrozen_molecules_per_s': timings['unfrozen'],
+            'frozen_molecules_per_s': timings['frozen'],
+            'max_abs_interaction_energy_diff': max_int_diff,
+            'max_rel_dimer_energy_diff': max_rel_diff
+        }
+
     def run_inference(self) -> Dict[str, pd.DataFrame]:
-        torch.cuda.synchronize()                            # ensure all operations are done before timing
+        self.synchronize()                                  # ensure all operations are done before timing
         start_time = time.time()
         interaction_energies = []
         for group_name, group_data in tqdm(self.data_dict.items(), desc="Running AIMNet2 model inference"):
@@ -130,21 +226,22 @@ class AIMNET2_Inference:
                 df['group'] = group_name
                 interaction_energies.append(df)
 
-        torch.cuda.synchronize()                            # ensure all GPU tasks are done before stopping the time
+        self.synchronize()                                  # ensure all GPU tasks are done before stopping the time
         end_time = time.time()
 
         print(f"AIMNet2 inference time for {self.ds_name}: {end_time - start_time:.2f} seconds")
         return pd.concat(interaction_energies, ignore_index=True)
     
-    def save_results(self, final_df: pd.DataFrame):
+    def save_results(self, final_df: pd.DataFrame, suffix: str = ""):
         os.makedirs("outputs", exist_ok=True)
-        final_df.to_csv(f"outputs/{self.model_name.upper()}_Inference_{self.ds_name}_intE.csv", index=False)
+        final_df.to_csv(f"outputs/{self.model_name.upper()}_Inference_{self.ds_name}_intE{suffix}.csv", index=False)
 
 if __name__ == "__main__":
     
     torch.set_grad_enabled(False)
     model_path, h5_path, ds_name = sys.argv[1:4]
+    device = sys.argv[4] if len(sys.argv) > 4 else 'cuda'
 
-    aimnet2_inference = AIMNET2_Inference(model_path, h5_path, ds_name)
+    aimnet2_inference = AIMNET2_Inference(model_path, h5_path, ds_name, device)
     interaction_energies = aimnet2_inference.run_inference()
     aimnet2_inference.save_results(interaction_energies)
@@ -3,45 +3,98 @@ import argparse
 import subprocess
 import pandas as pd
 import os
+import time
 from evaluate_metrics import evaluate_metrics
+from cost_planner import plan_costs, print_plan, append_timing_record, TIMING_RECORDS
 
-def run_inference(model_type, model_path, h5_path, ds_name):
+def run_inference(model_type, model_path, h5_path, ds_name, sample=None, seed=0, device='cuda'):
     cmd = [
         "python", "run_inference.py",
         "--model_type", model_type,
         "--model_path", model_path,
         "--h5_path", h5_path,
-        "--ds_name", ds_name
+        "--ds_name", ds_name,
+        "--device", device
     ]
+    if sample is not None:
+        cmd += ["--sample", str(sample), "--seed", str(seed)]
     print(f"\n Running inference: {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    # wait4 gives the resource usage of this child alone, so its peak memory can be recorded for --plan
+    proc = subprocess.Popen(cmd)
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return rusage.ru_maxrss / 1024**2                   # peak memory in GB, ru_maxrss is in KB on Linux
 
 def run_evaluation(csv_path):
     df = pd.read_csv(csv_path)
     return evaluate_metrics(df)
 
+DATASET_TYPES = {
+    'neutral_aimnet2_supported': ("config_neutral_aimnet2_supported.yaml", "metrics_summary_neutral_aimnet2_supported.csv"),
+    'neutral_others': ("config_neutral_others.yaml", "metrics_summary_neutral_others.csv"),
+    'charged_aimnet2_supported': ("config_charged_aimnet2_supported.yaml", "metrics_summary_charged_aimnet2_supported.csv"),
+    'charged_uma_supported': ("config_charged_uma_supported.yaml", "metrics_summary_charged_uma_supported.csv"),
+}
+
+def load_config(dataset_type, datasets=None, models=None):
+    # read the config of a dataset type, optionally restricted to the given dataset and model names
+    with open(DATASET_TYPES[dataset_type][0], "r") as file:
+        config = yaml.safe_load(file)
+    if datasets:
+        config["datasets"] = [d for d in config["datasets"] if d["name"] in datasets]
+    if models:
+        config["models"] = [m for m in config["models"] if os.path.splitext(os.path.basename(m["path"]))[0] in models]
+    return config
+
 def main():
     parser = argparse.ArgumentParser(description="Run batched inference using multiple models on multiple datasets")
-    parser.add_argument('--dataset_type', type=str, required=True, choices=['neutral_aimnet2_supported', 
-        'neutral_others', 'charged_aimnet2_supported', 'charged_uma_supported'], 
-            help = 'Dataset type to use: neutral_aimnet2_supported, neutral_others, charged_aimnet2_supported or charged_uma_supported')
+    parser.add_argument('--dataset_type', type=str, required=True, choices=list(DATASET_TYPES) + ['all'],
+            help = 'Dataset type to use: neutral_aimnet2_supported, neutral_others, charged_aimnet2_supported or charged_uma_supported '
+                   '(all: every dataset type, --plan only)')
+    parser.add_argument('--datasets', type=str, nargs='+', default=None,
+                        help='Only run these dataset names from the config')
+    parser.add_argument('--models', type=str, nargs='+', default=None,
+                        help='Only run these model names (model file name without extension) from the config')
+    parser.add_argument('--job_tag', type=str, default=None,
+                        help='Tag appended to the metrics summary file name, so split jobs do not overwrite each other')
+    parser.add_argument('--sample', type=float, default=None,
+                        help='Fraction of rows to sample per (HDF5 group, dimer_type) for a fast approximate evaluation')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for --sample')
+    parser.add_argument('--device', type=str, default='cuda', choices=['cuda', 'cpu'],
+                        help='Device to run on; for AIMNet2, cpu uses a frozen, inference-optimized model')
+    parser.add_argument('--plan', action='store_true',
+                        help='Dry run: predict runtime and peak memory per (dataset, model) from HDF5 metadata and suggest a job split')
+    parser.add_argument('--time_budget', type=float, default=23.5,
+                        help='Wall-time budget per job in hours for --plan')
+    parser.add_argument('--mem_limit', type=float, default=10.0,
+                        help='Memory limit per job in GB for --plan')
+    parser.add_argument('--timing_records', type=str, default=TIMING_RECORDS,
+                        help='CSV of previous timing records used to calibrate the --plan cost coefficients')
     args = parser.parse_args()
 
-    if args.dataset_type == 'neutral_aimnet2_supported':
-        config_file = "config_neutral_aimnet2_supported.yaml"
-        final_df_name = "metrics_summary_neutral_aimnet2_supported.csv"
-    elif args.dataset_type == 'neutral_others':
-        config_file = "config_neutral_others.yaml"
-        final_df_name = "metrics_summary_neutral_others.csv"
-    elif args.dataset_type == 'charged_aimnet2_supported':
-        config_file = "config_charged_aimnet2_supported.yaml"
-        final_df_name = "metrics_summary_charged_aimnet2_supported.csv"
-    elif args.dataset_type == 'charged_uma_supported':
-        config_file = "config_charged_uma_supported.yaml"
-        final_df_name = "metrics_summary_charged_uma_supported.csv"
+    if args.plan:
+        dataset_types = list(DATASET_TYPES) if args.dataset_type == 'all' else [args.dataset_type]
+        plan_df = pd.concat([plan_costs(load_config(t, args.datasets, args.models), t, args.device, args.timing_records)
+                             for t in dataset_types], ignore_index=True)
+        if plan_df.empty:
+            raise ValueError("No (dataset, model) runs to plan after --datasets/--models filtering")
+        plan_df = print_plan(plan_df, args.time_budget, args.mem_limit, args.device)
+        plan_df.to_csv(f"plan_{args.dataset_type}.csv", index=False)
+        return
+    if args.dataset_type == 'all':
+        parser.error("--dataset_type all is only supported together with --plan")
 
-    with open(config_file, "r") as file:
-        config = yaml.safe_load(file)
+    config = load_config(args.dataset_type, args.datasets, args.models)
+    if not config["datasets"] or not config["models"]:
+        raise ValueError(f"No datasets or models left in the {args.dataset_type} config after --datasets/--models filtering")
+    final_df_name = DATASET_TYPES[args.dataset_type][1]
+    suffix = "_sample" if args.sample is not None else ""
+    final_df_name = final_df_name.replace(".csv", f"{suffix}.csv")
+    if args.job_tag:
+        final_df_name = final_df_name.replace(".csv", f"_{args.job_tag}.csv")
 
     results = []
 
@@ -54,9 +107,10 @@ def main():
             model_path = model["path"]
             model_name = os.path.splitext(os.path.basename(model_path))[0]
 
-            # run inference
-            run_inference(model_type, model_path, h5_path, name)
-            csv_file = f"{model_name.upper()}_Inference_{name}_intE.csv"
+            # run inference, timed end to end (interpreter start, imports, HDF5 loading, evaluation) for --plan
+            start_time = time.time()
+            peak_mem_gb = run_inference(model_type, model_path, h5_path, name, args.sample, args.seed, args.device)
+            csv_file = f"{model_name.upper()}_Inference_{name}_intE{suffix}.csv"
             csv_path = os.path.join("outputs", csv_file)
     
             if not os.path.exists(csv_path):
@@ -70,9 +124,16 @@ def main():
             metrics["ModelName"] = model_name
             results.append(metrics)
 
+            if args.sample is None:
+                append_timing_record(model_type, model_name, name, h5_path, args.device,
+                                     time.time() - start_time, peak_mem_gb, args.timing_records)
+
     # save all results to a pandas dataframe
     final_df = pd.DataFrame(results)
-    final_df = final_df[["Dataset", "ModelType", "ModelName", "R2", "Pearson_R2", "RMSE (kcal/mol)", "MAE (kcal/mol)"]]
+    columns = ["Dataset", "ModelType", "ModelName", "R2", "Pearson_R2", "RMSE (kcal/mol)", "MAE (kcal/mol)"]
+    if args.sample is not None:
+        columns += ["N_sampled", "N_total"] + [f"{k}_CI_{b}" for k in ("R2", "Pearson_R2", "RMSE", "MAE") for b in ("low", "high")]
+    final_df = final_df[columns]
     final_df.to_csv(final_df_name, index=False)
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+import os
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+import h5py
+from scipy.optimize import nnls
+from typing import Dict, List
+
+TIMING_RECORDS = "outputs/timing_records.csv"
+
+# rough starting coefficients per device used until enough timing records exist for a backend
+# runtime (s) = c0 + c_rows * n_rows + c_atoms * n_atoms + c_strata * n_strata
+DEFAULT_TIME_COEFFS = {
+    'cuda': {
+        'aimnet2':  [30.0, 1e-4, 1e-6, 0.05],
+        'maceoff':  [30.0, 0.06, 1e-4, 0.0],
+        'maceomol': [60.0, 0.3, 5e-4, 0.0],
+        'umaomol':  [60.0, 0.1, 2e-4, 0.0],
+    },
+    'cpu': {
+        'aimnet2':  [60.0, 5e-3, 1e-4, 0.01],
+        'maceoff':  [30.0, 0.6, 2e-3, 0.0],
+        'maceomol': [60.0, 5.0, 2e-2, 0.0],
+        'umaomol':  [60.0, 2.0, 8e-3, 0.0],
+    },
+}
+# peak host memory (GB) = m0 + m_data * data_gb
+DEFAULT_MEM_COEFFS = {
+    'cuda': {
+        'aimnet2':  [2.0, 3.0],
+        'maceoff':  [3.0, 3.0],
+        'maceomol': [6.0, 3.0],
+        'umaomol':  [5.0, 3.0],
+    },
+    'cpu': {
+        'aimnet2':  [2.0, 4.0],
+        'maceoff':  [3.0, 3.0],
+        'maceomol': [6.0, 3.0],
+        'umaomol':  [5.0, 3.0],
+    },
+}
+
+def scan_h5_metadata(h5_path: str) -> Dict[str, float]:
+    # reads only natoms0/natoms1 and dataset shapes, never the coordinates themselves
+    n_rows, n_atoms, n_strata, data_bytes = 0, 0, 0, 0
+    with h5py.File(h5_path, 'r') as h5_file:
+        for key in h5_file.keys():
+            group = h5_file[key]
+            natoms0 = group['natoms0'][:]
+            natoms1 = group['natoms1'][:]
+            n_rows += len(natoms0)
+            n_atoms += int(np.sum(natoms0) + np.sum(natoms1))
+            n_strata += len(set(zip(natoms0.tolist(), natoms1.tolist())))
+            data_bytes += sum(ds.size * ds.dtype.itemsize for ds in group.values())
+    return {'n_rows': n_rows, 'n_atoms': n_atoms, 'n_strata': n_strata, 'data_gb': data_bytes / 1024**3}
+
+def append_timing_record(model_type: str, model_name: str, ds_name: str, h5_path: str, device: str, seconds: float,
+                         peak_mem_gb: float, path: str = TIMING_RECORDS):
+    record = {'model_type': model_type, 'model_name': model_name, 'dataset': ds_name, 'device': device,
+              **scan_h5_metadata(h5_path), 'seconds': seconds, 'peak_mem_gb': peak_mem_gb}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    columns = list(record)
+    if os.path.exists(path):
+        existing = list(pd.read_csv(path, nrows=0).columns)
+        if set(existing) == set(columns):
+            columns = existing                          # append in the file's own column order
+        else:
+            # older record format (e.g. without device): move it aside instead of appending mismatched rows
+            os.replace(path, f"{path}.legacy")
+            print(f"Timing records in {path} have an outdated format, moved to {path}.legacy")
+    pd.DataFrame([record])[columns].to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def load_timing_records(path: str = TIMING_RECORDS) -> pd.DataFrame:
+    columns = ['model_type', 'model_name', 'device', 'seconds', 'peak_mem_gb']
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    records = pd.read_csv(path)
+    if 'device' not in records.columns:                 # records written before the device column cannot be attributed
+        return pd.DataFrame(columns=columns)
+    return records
+
+def time_features(meta) -> List[float]:
+    return [1.0, meta['n_rows'], meta['n_atoms'], meta['n_strata']]
+
+def mem_features(meta) -> List[float]:
+    return [1.0, meta['data_gb']]
+
+def fit_coefficients(records: pd.DataFrame, features, target: str, default: List[float]) -> List[float]:
+    # non-negative least squares keeps every cost term physically meaningful; needs more records than terms
+    if len(records) <= len(default):
+        return default
+    A = np.array([features(row) for _, row in records.iterrows()])
+    coeffs, _ = nnls(A, records[target].to_numpy(dtype=float))
+    return coeffs.tolist()
+
+def calibrate(records: pd.DataFrame, model_type: str, model_name: str, device: str):
+    # prefer records of the exact model, then of the backend, then the defaults; never mix devices
+    time_default = DEFAULT_TIME_COEFFS[device][model_type]
+    mem_default = DEFAULT_MEM_COEFFS[device][model_type]
+    records = records[records['device'] == device]
+    for subset in (records[records['model_name'] == model_name], records[records['model_type'] == model_type]):
+        if len(subset) > len(time_default):
+            return (fit_coefficients(subset, time_features, 'seconds', time_default),
+                    fit_coefficients(subset, mem_features, 'peak_mem_gb', mem_default), len(subset))
+    return time_default, mem_default, 0
+
+def plan_costs(config: dict, dataset_type: str, device: str = 'cuda', records_path: str = TIMING_RECORDS) -> pd.DataFrame:
+    records = load_timing_records(records_path)
+
+    rows = []
+    for dataset in config["datasets"]:
+        meta = scan_h5_metadata(dataset["h5_path"])
+        for model in config["models"]:
+            model_type = model["type"]
+            model_name = os.path.splitext(os.path.basename(model["path"]))[0]
+            time_coeffs, mem_coeffs, n_records = calibrate(records, model_type, model_name, device)
+            rows.append({
+                'DatasetType': dataset_type,
+                'Dataset': dataset["name"],
+                'ModelType': model_type,
+                'ModelName': model_name,
+                'Rows': meta['n_rows'],
+                'Predicted runtime (h)': float(np.dot(time_coeffs, time_features(meta))) / 3600,
+                'Predicted peak memory (GB)': float(np.dot(mem_coeffs, mem_features(meta))),
+                'Calibration records': n_records
+            })
+    return pd.DataFrame(rows)
+
+def suggest_jobs(plan_df: pd.DataFrame, time_budget_h: float) -> List[List[int]]:
+    # first-fit decreasing bin packing of (dataset, model) runs into jobs of at most time_budget_h each
+    jobs, loads = [], []
+    for idx in plan_df.sort_values('Predicted runtime (h)', ascending=False).index:
+        runtime = plan_df.at[idx, 'Predicted runtime (h)']
+        for j, load in enumerate(loads):
+            if load + runtime <= time_budget_h:
+                jobs[j].append(idx)
+                loads[j] += runtime
+                break
+        else:
+            jobs.append([idx])
+            loads.append(runtime)
+    return jobs
+
+def job_commands(job_df: pd.DataFrame, job_id: int, device: str = 'cuda') -> List[str]:
+    # one batched_inference.py call per (dataset type, model set), covering exactly the runs of the job
+    model_sets = defaultdict(list)
+    for (dataset_type, dataset), runs in job_df.groupby(['DatasetType', 'Dataset'], sort=False):
+        model_sets[(dataset_type, tuple(runs['ModelName']))].append(dataset)
+
+    commands = []
+    for k, ((dataset_type, models), datasets) in enumerate(model_sets.items(), 1):
+        cmd = (f"python batched_inference.py --dataset_type {dataset_type} --datasets {' '.join(datasets)} "
+               f"--models {' '.join(models)} --job_tag job{job_id}_{k}")
+        if device != 'cuda':
+            cmd += f" --device {device}"
+        commands.append(cmd)
+    return commands
+
+def print_plan(plan_df: pd.DataFrame, time_budget_h: float, mem_limit_gb: float, device: str = 'cuda') -> pd.DataFrame:
+    # prints the plan and the suggested job split, returns the plan with the job number of every run
+    print(plan_df.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    print(f"\nTotal predicted runtime: {plan_df['Predicted runtime (h)'].sum():.2f} h on {device} "
+          f"(budget per job: {time_budget_h:.2f} h, memory limit: {mem_limit_gb:.1f} GB)")
+
+    for _, row in plan_df.iterrows():
+        if row['Predicted runtime (h)'] > time_budget_h:
+            print(f" {row['ModelName']} on {row['Dataset']} alone exceeds the time budget, consider --sample")
+        if row['Predicted peak memory (GB)'] > mem_limit_gb:
+            print(f" {row['ModelName']} on {row['Dataset']} may exceed the memory limit")
+
+    plan_df = plan_df.copy()
+    jobs = suggest_jobs(plan_df, time_budget_h)
+    print(f"\nSuggested split into {len(jobs)} job(s):")
+    for j, job in enumerate(jobs, 1):
+        plan_df.loc[job, 'Job'] = j
+        job_df = plan_df.loc[sorted(job)]
+        print(f"  Job {j}: {job_df['Predicted runtime (h)'].sum():.2f} h, "
+              f"peak {job_df['Predicted peak memory (GB)'].max():.2f} GB")
+        for cmd in job_commands(job_df, j, device):
+            print(f"    {cmd}")
+    plan_df['Job'] = plan_df['Job'].astype(int)
+    return plan_df
@@ -6,7 +6,63 @@ from scipy.stats import pearsonr
 from math import sqrt
 import argparse
 
+def weighted_metrics(y_true: np.ndarray, y_pred: np.ndarray, weights: np.ndarray) -> dict:
+    err = y_pred - y_true
+    cov = np.cov(y_true, y_pred, aweights=weights)
+    return {
+        'R2': r2_score(y_true, y_pred, sample_weight=weights),
+        'Pearson_R2': cov[0, 1] ** 2 / (cov[0, 0] * cov[1, 1]),
+        'RMSE': sqrt(np.average(err ** 2, weights=weights)),
+        'MAE': np.average(np.abs(err), weights=weights)
+    }
+
+def evaluate_sampled_metrics(df: pd.DataFrame, n_bootstrap: int = 1000, seed: int = 0) -> dict:
+    # estimates from a stratified subsample (run_inference.py --sample): rows are weighted by their inverse
+    # sampling fraction. 95% confidence intervals come from the Rao-Wu rescaling bootstrap (n_h - 1 draws per
+    # stratum), which includes the finite-population correction; fully enumerated strata contribute no variance.
+    y_true = df['ref_energy_int'].to_numpy()
+    y_pred = df['pred_energy_int'].to_numpy()
+    weights = df['sample_weight'].to_numpy()
+    estimate = weighted_metrics(y_true, y_pred, weights)
+
+    strata = df.groupby(['group', 'dimer_type'], sort=False).ngroup().to_numpy()
+    order = np.argsort(strata, kind='stable')
+    counts = np.bincount(strata)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    row_strata = strata[order]
+    y_true_sorted, y_pred_sorted, w_sorted = y_true[order], y_pred[order], weights[order]
+
+    # per-row rescaling terms: lambda_h = sqrt(1 - f_h) with f_h = n_h / N_h = 1 / weight
+    n_h = counts[row_strata]
+    lam = np.sqrt(np.clip(1 - 1 / w_sorted, 0, None))
+    scale = np.where(n_h > 1, n_h / np.maximum(n_h - 1, 1), 0)
+    draw_strata = np.repeat(np.arange(len(counts)), np.maximum(counts - 1, 0))
+
+    rng = np.random.default_rng(seed)
+    boot = {k: np.empty(n_bootstrap) for k in estimate}
+    for b in range(n_bootstrap):
+        picks = starts[draw_strata] + np.floor(rng.random(len(draw_strata)) * counts[draw_strata]).astype(int)
+        r = np.bincount(picks, minlength=len(order))
+        w_boot = w_sorted * (1 - lam + lam * scale * r)
+        for k, v in weighted_metrics(y_true_sorted, y_pred_sorted, w_boot).items():
+            boot[k][b] = v
+
+    metrics = {
+        'R2': estimate['R2'],
+        'Pearson_R2': estimate['Pearson_R2'],
+        'RMSE (kcal/mol)': estimate['RMSE'],
+        'MAE (kcal/mol)': estimate['MAE'],
+        'N_sampled': len(df),
+        'N_total': int(round(weights.sum()))
+    }
+    for k in estimate:
+        metrics[f'{k}_CI_low'], metrics[f'{k}_CI_high'] = np.percentile(boot[k], [2.5, 97.5])
+    return metrics
+
 def evaluate_metrics(df: pd.DataFrame) -> dict:
+    if 'sample_weight' in df.columns:
+        return evaluate_sampled_metrics(df)
+
     y_true = df['ref_energy_int']
     y_pred = df['pred_energy_int']
     
@@ -35,10 +91,18 @@ def main():
     metrics = evaluate_metrics(df)
 
     print(f"\nEvaluation Results for: {os.path.basename(args.csv_path)}")
+    if 'N_sampled' in metrics:
+        print(f"Estimated from {metrics['N_sampled']} of {metrics['N_total']} rows (95% CI in brackets)")
+        print(f"R²              : {metrics['R2']:.4f} [{metrics['R2_CI_low']:.4f}, {metrics['R2_CI_high']:.4f}]")
+        print(f"Pearson's R²    : {metrics['Pearson_R2']:.4f} [{metrics['Pearson_R2_CI_low']:.4f}, {metrics['Pearson_R2_CI_high']:.4f}]")
+        print(f"RMSE            : {metrics['RMSE (kcal/mol)']:.4f} [{metrics['RMSE_CI_low']:.4f}, {metrics['RMSE_CI_high']:.4f}]")
+        print(f"MAE             : {metrics['MAE (kcal/mol)']:.4f} [{metrics['MAE_CI_low']:.4f}, {metrics['MAE_CI_high']:.4f}]")
+        return
+
     print(f"R²              : {metrics['R2']:.4f}")
     print(f"Pearson's R²    : {metrics['Pearson_R2']:.4f}")
-    print(f"RMSE            : {metrics['RMSE']:.4f}")
-    print(f"MAE             : {metrics['MAE']:.4f}")
+    print(f"RMSE            : {metrics['RMSE (kcal/mol)']:.4f}")
+    print(f"MAE             : {metrics['MAE (kcal/mol)']:.4f}")
 
 if __name__ == "__main__":
     main()
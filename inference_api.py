@@ -0,0 +1,120 @@
+import argparse
+import time
+import numpy as np
+import h5py
+from typing import Dict, Optional
+from aimnet2_inference import AIMNET2_Inference
+from maceoff_inference import MACEOFF_Inference
+from maceomol_inference import MACEOMOL_Inference
+from umaomol_inference import UMAOMOL_Inference
+
+MODEL_CLASSES = {
+    'aimnet2': AIMNET2_Inference,
+    'maceoff': MACEOFF_Inference,
+    'maceomol': MACEOMOL_Inference,
+    'umaomol': UMAOMOL_Inference,
+}
+
+def load_model(model_type: str, model_path: str, device: str = 'cuda'):
+    # load the model once (no HDF5 input) on device and reuse it across compute_interaction_energies calls
+    if model_type not in MODEL_CLASSES:
+        raise ValueError(f"Unknown model type: {model_type}, expected one of {list(MODEL_CLASSES)}")
+    return MODEL_CLASSES[model_type](model_path, device=device)
+
+def compute_interaction_energies(model, coord: np.ndarray, numbers: np.ndarray, natoms0: np.ndarray, natoms1: np.ndarray,
+                                 charge0: Optional[np.ndarray] = None, charge1: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    # coord: (N, natoms, 3), numbers: (N, natoms), monomer 0 atoms first; charges default to neutral monomers.
+    # Returns dimer, monomer and interaction energies in kcal/mol, in the input order.
+    coord = np.asarray(coord)
+    numbers = np.asarray(numbers)
+    natoms0 = np.asarray(natoms0)
+    natoms1 = np.asarray(natoms1)
+    n = len(coord)
+    charge0 = np.zeros(n) if charge0 is None else np.asarray(charge0)
+    charge1 = np.zeros(n) if charge1 is None else np.asarray(charge1)
+
+    e_dim = np.empty(n)
+    e_mol0 = np.empty(n)
+    e_mol1 = np.empty(n)
+    for n0, n1 in set(zip(natoms0.tolist(), natoms1.tolist())):
+        indices = np.flatnonzero((natoms0 == n0) & (natoms1 == n1))
+        selected_coord = coord[indices]
+        selected_numbers = numbers[indices]
+
+        e_dim[indices] = model.predict_energies({
+            'coord': selected_coord,
+            'numbers': selected_numbers,
+            'charge': charge0[indices] + charge1[indices]
+        })
+        e_mol0[indices] = model.predict_energies({
+            'coord': selected_coord[:, :n0, :],
+            'numbers': selected_numbers[:, :n0],
+            'charge': charge0[indices]
+        })
+        e_mol1[indices] = model.predict_energies({
+            'coord': selected_coord[:, n0:n0+n1, :],
+            'numbers': selected_numbers[:, n0:n0+n1],
+            'charge': charge1[indices]
+        })
+
+    return {
+        'pred_dimer_energy': e_dim,
+        'pred_mol0_energy': e_mol0,
+        'pred_mol1_energy': e_mol1,
+        'pred_energy_int': e_dim - e_mol0 - e_mol1
+    }
+
+def benchmark_latency(model, h5_path: str, batch_sizes=(1, 10, 100, 1000), n_repeats: int = 5) -> Dict[int, float]:
+    # latency of compute_interaction_energies per batch of dimers gathered across HDF5 groups.
+    # Groups may differ in atom count, so every batch is a list of per-group chunks evaluated in one call each.
+    keys = ('coord', 'numbers', 'charge0', 'charge1', 'natoms0', 'natoms1')
+    chunks, n_rows = [], 0
+    with h5py.File(h5_path, 'r') as h5_file:
+        for group_name in h5_file.keys():
+            if n_rows >= max(batch_sizes):
+                break
+            group = h5_file[group_name]
+            n = min(len(group['coord']), max(batch_sizes) - n_rows)
+            chunks.append({k: group[k][:n] for k in keys})
+            n_rows += n
+
+    latencies = {}
+    for batch_size in batch_sizes:
+        if batch_size > n_rows:
+            print(f"Batch size {batch_size:>5}: skipped, only {n_rows} dimers in {h5_path}")
+            continue
+        batch, remaining = [], batch_size
+        for chunk in chunks:
+            if remaining == 0:
+                break
+            n = min(len(chunk['coord']), remaining)
+            batch.append({k: v[:n] for k, v in chunk.items()})
+            remaining -= n
+
+        for part in batch:                                              # warm-up
+            compute_interaction_energies(model, **part)
+        start_time = time.time()
+        for _ in range(n_repeats):
+            for part in batch:
+                compute_interaction_energies(model, **part)
+        latencies[batch_size] = (time.time() - start_time) / n_repeats
+        print(f"Batch size {batch_size:>5}: {latencies[batch_size] * 1000:.2f} ms/batch ({len(batch)} call(s), {batch_size / latencies[batch_size]:.2f} dimers/s)")
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call latency of the in-memory interaction energy API")
+    parser.add_argument('--model_type', type=str, required=True, choices=list(MODEL_CLASSES),
+                        help='Model type to use: aimnet2, maceoff, maceomol or umaomol')
+    parser.add_argument('--model_path', type=str, required=True,
+                        help='File path for the intended model')
+    parser.add_argument('--h5_path', type=str, required=True,
+                        help='HDF5 dataset file to take sample dimers from')
+    parser.add_argument('--device', type=str, default='cuda', choices=['cuda', 'cpu'],
+                        help='Device to run on')
+    args = parser.parse_args()
+
+    model = load_model(args.model_type, args.model_path, args.device)
+    benchmark_latency(model, args.h5_path)
+
+if __name__ == "__main__":
+    main()
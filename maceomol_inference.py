@@ -6,7 +6,7 @@ import h5py
 from tqdm import tqdm
 from ase import Atoms
 from mace.calculators import mace_omol
-from typing import Dict
+from typing import Dict, Optional
 import time
 import warnings
 warnings.filterwarnings(
@@ -16,12 +16,12 @@ warnings.filterwarnings(
 )
 
 class MACEOMOL_Inference:
-    def __init__(self, model_path: str, h5_path: str, ds_name: str):
+    def __init__(self, model_path: str, h5_path: Optional[str] = None, ds_name: Optional[str] = None, device: str = 'cuda'):
         self.model_name = os.path.splitext(os.path.basename(model_path))[0]
         self.h5_path = h5_path
         self.ds_name = ds_name
-        self.data_dict = self.extract_input_from_h5()
-        self.calc = mace_omol(model=model_path, device='cuda')
+        self.data_dict = self.extract_input_from_h5() if h5_path is not None else {}
+        self.calc = mace_omol(model=model_path, device=device)
         self.calc.energy_units_to_eV
 
     def extract_input_from_h5(self, chunk_size: int = 1000) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
@@ -89,6 +89,10 @@ class MACEOMOL_Inference:
             energies.append(energy)
         return np.array(energies)
 
+    def predict_energies(self, data: Dict[str, np.ndarray]) -> np.ndarray:
+        # in-memory entry point used by inference_api, energies in kcal/mol
+        return self.calculate_energies(data) * 23.0609
+
     def create_molecule(self, coord, numbers, charge) -> Atoms:
         atoms = Atoms(numbers=numbers, positions=coord)
         atoms.info['charge'] = int(charge)
@@ -125,9 +129,9 @@ class MACEOMOL_Inference:
         print(f"MACE-OMOL inference time for {self.ds_name}: {end_time - start_time:.2f} seconds")
         return pd.concat(interaction_energies, ignore_index=True)
 
-    def save_results(self, final_df: pd.DataFrame):
+    def save_results(self, final_df: pd.DataFrame, suffix: str = ""):
         os.makedirs("outputs", exist_ok=True)
-        final_df.to_csv(f"outputs/{self.model_name.upper()}_Inference_{self.ds_name}_intE.csv", index=False)
+        final_df.to_csv(f"outputs/{self.model_name.upper()}_Inference_{self.ds_name}_intE{suffix}.csv", index=False)
 
 if __name__ == "__main__":
     model_path, h5_path, ds_name = sys.argv[1:4]
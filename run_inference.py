@@ -4,6 +4,18 @@ from aimnet2_inference import AIMNET2_Inference
 from maceoff_inference import MACEOFF_Inference
 from maceomol_inference import MACEOMOL_Inference
 from umaomol_inference import UMAOMOL_Inference
+from sampling import stratified_subsample, add_sample_weights
+
+def run_and_save(model, sample=None, seed=0):
+    if sample is None:
+        results = model.run_inference()
+        model.save_results(results)
+        return
+
+    # approximate mode: infer on a stratified subset only, rows carry weights for evaluate_metrics
+    model.data_dict, weights = stratified_subsample(model.data_dict, sample, seed)
+    results = add_sample_weights(model.run_inference(), weights)
+    model.save_results(results, suffix="_sample")
 
 def main():
     parser = argparse.ArgumentParser(description="Run inference using AIMNet2, MACE-OFF, MACE-OMOL or UMA-OMOL models")
@@ -15,39 +27,47 @@ def main():
                         help='File path to the input HDF5 dataset file')
     parser.add_argument('--ds_name', type=str, required=True,
                         help='Dataset name')
+    parser.add_argument('--device', type=str, default='cuda', choices=['cuda', 'cpu'],
+                        help='Device to run on; for AIMNet2, cpu uses a frozen, inference-optimized model')
+    parser.add_argument('--benchmark_frozen', action='store_true',
+                        help='Report molecules/s and energy agreement of the frozen CPU AIMNet2 model vs the unfrozen one')
+    parser.add_argument('--sample', type=float, default=None,
+                        help='Fraction of rows to sample per (HDF5 group, dimer_type) for a fast approximate evaluation')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed for --sample')
     args = parser.parse_args()
 
     if args.model_type == 'aimnet2':
         if not args.model_path or not os.path.isfile(args.model_path):
             raise ValueError("A valid --model_path must be provided for AIMNet2 model")
         print(f"Running AIMNet2 on dataset: {args.ds_name}")
-        model = AIMNET2_Inference(args.model_path, args.h5_path, args.ds_name)
-        results = model.run_inference()
-        model.save_results(results)
+        model = AIMNET2_Inference(args.model_path, args.h5_path, args.ds_name, args.device)
+        if args.benchmark_frozen:
+            if args.device != 'cpu':
+                raise ValueError("--benchmark_frozen requires --device cpu")
+            model.benchmark_frozen_model()
+        run_and_save(model, args.sample, args.seed)
 
     elif args.model_type == 'maceoff':
         if not args.model_path or not os.path.isfile(args.model_path):
             raise ValueError("A valid --model_path must be provided for MACE-OFF model")
         print(f"Running MACE-OFF on dataset: {args.ds_name}")
-        model = MACEOFF_Inference(args.model_path, args.h5_path, args.ds_name)
-        results = model.run_inference()
-        model.save_results(results)
+        model = MACEOFF_Inference(args.model_path, args.h5_path, args.ds_name, args.device)
+        run_and_save(model, args.sample, args.seed)
 
     elif args.model_type == 'maceomol':
         if not args.model_path or not os.path.isfile(args.model_path):
             raise ValueError("A valid --model_path must be provided for MACE-OMOL model")
         print(f"Running MACE-OMOL on dataset: {args.ds_name}")
-        model = MACEOMOL_Inference(args.model_path, args.h5_path, args.ds_name)
-        results = model.run_inference()
-        model.save_results(results)
+        model = MACEOMOL_Inference(args.model_path, args.h5_path, args.ds_name, args.device)
+        run_and_save(model, args.sample, args.seed)
 
     elif args.model_type == 'umaomol':
         if not args.model_path or not os.path.isfile(args.model_path):
             raise ValueError("A valid --model_path must be provided for UMA-OMOL model")
         print(f"Running UMA-OMOL on dataset: {args.ds_name}")
-        model = UMAOMOL_Inference(args.model_path, args.h5_path, args.ds_name)
-        results = model.run_inference()
-        model.save_results(results)
+        model = UMAOMOL_Inference(args.model_path, args.h5_path, args.ds_name, args.device)
+        run_and_save(model, args.sample, args.seed)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+
+def stratified_subsample(data_dict: Dict, fraction: float, seed: int = 0) -> Tuple[Dict, Dict[Tuple[str, str], float]]:
+    # keep a fixed-seed random fraction of rows within every (HDF5 group, dimer_type) stratum. Strata with 2+ rows
+    # keep at least 2 so their variance can be estimated; single-row strata are kept whole.
+    # Returns the subsampled data_dict and the inverse sampling fraction (weight) of every stratum.
+    if not 0 < fraction <= 1:
+        raise ValueError(f"Sample fraction must be in (0, 1], got {fraction}")
+
+    rng = np.random.default_rng(seed)
+    sampled_dict = {}
+    weights = {}
+    n_total, n_kept = 0, 0
+    for group_name in sorted(data_dict):
+        sampled_dict[group_name] = {}
+        for dimer_type in sorted(data_dict[group_name]):
+            data = data_dict[group_name][dimer_type]
+            n_rows = len(data['dimer']['geom_id'])
+            n_sampled = min(n_rows, max(2, int(round(fraction * n_rows))))
+            n_total += n_rows
+            n_kept += n_sampled
+            indices = np.sort(rng.choice(n_rows, size=n_sampled, replace=False)).tolist()
+
+            sampled_dict[group_name][dimer_type] = {
+                part: {k: v[indices] for k, v in part_data.items()} for part, part_data in data.items()
+            }
+            weights[(group_name, dimer_type)] = n_rows / n_sampled
+
+    effective_fraction = n_kept / max(n_total, 1)
+    if effective_fraction > 2 * fraction:
+        print(f"Warning: sampled {n_kept} of {n_total} rows ({effective_fraction:.1%}), well above --sample {fraction:.1%} "
+              f"because of the minimum rows per (group, dimer_type) stratum")
+    return sampled_dict, weights
+
+def add_sample_weights(df: pd.DataFrame, weights: Dict[Tuple[str, str], float]) -> pd.DataFrame:
+    df['sample_weight'] = [weights[(g, t)] for g, t in zip(df['group'], df['dimer_type'])]
+    return df